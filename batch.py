@@ -0,0 +1,98 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from utils import process_xml_to_docx, ConversionCancelled
+from docx_writer import DEFAULT_COMPRESSION
+from metrics import ConversionStats
+
+# Cada cuánto se comprueba cancel_event mientras se espera a los procesos del lote.
+CANCEL_POLL_SECONDS = 0.2
+
+def collect_xml_files(source):
+    # Acepta una carpeta (todos sus .xml) o un patrón glob como "agendas/*.xml".
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(path for path in paths
+                  if path.lower().endswith('.xml') and os.path.isfile(path))
+
+def output_name_for(xml_file):
+    return os.path.splitext(os.path.basename(xml_file))[0] + ".docx"
+
+def convert_file(xml_file, output_folder, output_file_name=None, streaming=False, config=None,
+                 event_jobs=1, cache=None, incremental=False, compression=DEFAULT_COMPRESSION,
+                 stats=None, profile=None, progress_callback=None, cancel_event=None):
+    output_file_name = output_file_name or output_name_for(xml_file)
+    return process_xml_to_docx(xml_file, output_folder, output_file_name,
+                               streaming=streaming, config=config, jobs=event_jobs,
+                               cache=cache, incremental=incremental,
+                               compression=compression, stats=stats, profile=profile,
+                               progress_callback=progress_callback,
+                               cancel_event=cancel_event)
+
+def process_xml_batch(xml_files, output_folder, max_workers=None, progress_callback=None,
+                      streaming=False, config=None, event_jobs=1, cache=None, incremental=False,
+                      compression=DEFAULT_COMPRESSION, log_stats=False, trace_memory=False,
+                      profile=None, cancel_event=None):
+    # Convierte cada XML en un proceso del pool. Un archivo con errores no detiene el
+    # lote: el error queda en su resultado (xml_file, output_path, error). Con un solo
+    # proceso se convierte en el propio proceso, sin crear el pool, y entonces cada
+    # archivo puede repartir sus eventos entre event_jobs procesos. Con log_stats cada
+    # conversión imprime sus métricas por etapa (metrics.ConversionStats). Si se activa
+    # cancel_event no se empiezan más archivos y se lanza ConversionCancelled; sin pool,
+    # el archivo en curso también se detiene entre dos eventos.
+    results = []
+    if not xml_files:
+        return results
+
+    def new_stats():
+        return ConversionStats(trace_memory=trace_memory, log=True) if log_stats else None
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        for done, xml_file in enumerate(xml_files, 1):
+            try:
+                output_path = convert_file(xml_file, output_folder, streaming=streaming, config=config,
+                                           event_jobs=event_jobs, cache=cache,
+                                           incremental=incremental, compression=compression,
+                                           stats=new_stats(), profile=profile,
+                                           cancel_event=cancel_event)
+                error = None
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                output_path, error = None, str(e)
+            results.append((xml_file, output_path, error))
+            if progress_callback:
+                progress_callback(done, len(xml_files), xml_file, error)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(xml_files))) as executor:
+        futures = {executor.submit(convert_file, xml_file, output_folder,
+                                   streaming=streaming, config=config, cache=cache,
+                                   incremental=incremental, compression=compression,
+                                   stats=new_stats(), profile=profile): xml_file
+                   for xml_file in xml_files}
+        # Los archivos que ya se están convirtiendo en otro proceso terminan igualmente;
+        # al cancelar sólo se descartan los que no han empezado.
+        pending = set(futures)
+        timeout = CANCEL_POLL_SECONDS if cancel_event is not None else None
+        while pending:
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise ConversionCancelled()
+            for future in finished:
+                xml_file = futures[future]
+                try:
+                    output_path, error = future.result(), None
+                except Exception as e:
+                    output_path, error = None, str(e)
+                results.append((xml_file, output_path, error))
+                if progress_callback:
+                    progress_callback(len(results), len(futures), xml_file, error)
+
+    order = {xml_file: idx for idx, xml_file in enumerate(xml_files)}
+    results.sort(key=lambda result: order[result[0]])
+    return results
@@ -0,0 +1,102 @@
+import argparse
+import random
+from xml.sax.saxutils import escape
+
+# Genera agendas XML sintéticas con el mismo esquema que las reales:
+# Agenda > Evento-Principal > Evento-Principal-Programa > Sub-evento >
+# Sub-evento-actividades > actividad. Con la misma semilla el XML es siempre el mismo,
+# así que los resultados de distintas ejecuciones se pueden comparar.
+
+PLACES = ["Plaza Mayor", "Auditorio Municipal", "Casa de Cultura", "Parque del Río",
+          "Iglesia de San Pedro", "Polideportivo", "Salón de Plenos"]
+WORDS = ["concierto", "pasacalles", "verbena", "exposición", "taller", "homenaje", "teatro",
+         "degustación", "procesión", "charanga", "fuegos", "cine", "danza", "mercado",
+         "infantil", "popular", "tradicional", "gigantes", "cabezudos", "banda"]
+DAYS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+def sentence(rng, min_words, max_words):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+    return text.capitalize()
+
+def description(rng):
+    # Algunas descripciones traen saltos de línea o un "&" sin escapar, como las que
+    # llegan exportadas a mano, para que la sanitización tenga trabajo real.
+    text = escape(sentence(rng, 8, 30))
+    roll = rng.random()
+    if roll < 0.2:
+        text += "\n" + escape(sentence(rng, 4, 12))
+    elif roll < 0.3:
+        text += " Rock & Roll"
+    return text
+
+def hour(rng):
+    return f"{rng.randint(8, 23):02d}:{rng.choice(['00', '15', '30', '45'])}"
+
+def write_fields(out, fields):
+    for tag, text in fields:
+        out.append(f"<{tag}>{text}</{tag}>")
+
+def generate_agenda(events, sub_events=3, activities=3, seed=1):
+    # Devuelve el XML como texto. sub_events y activities fijan cuántos Sub-evento
+    # tiene cada Evento-Principal y cuántas actividad cada Sub-evento; con 0 el árbol
+    # es menos profundo.
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n<Agenda>\n']
+    for event in range(events):
+        out.append("<Evento-Principal>")
+        write_fields(out, [
+            ("Evento-Principal-Titulo", escape(sentence(rng, 2, 6))),
+            ("Evento-Principal-Dia", f"{rng.choice(DAYS)} {event % 28 + 1}"),
+            ("Evento-Principal-Hora", hour(rng)),
+            ("Evento-Principal-Lugar", rng.choice(PLACES)),
+            ("Evento-Principal-Descripcion", description(rng)),
+            ("Evento-Principal-info-extra", escape(sentence(rng, 2, 8))),
+        ])
+        if sub_events:
+            out.append("<Evento-Principal-Programa>")
+            for _ in range(sub_events):
+                out.append("<Sub-evento>")
+                write_fields(out, [
+                    ("Sub-evento-Titulo", escape(sentence(rng, 2, 5))),
+                    ("Sub-evento-Dia", rng.choice(DAYS)),
+                    ("Sub-evento-Hora", hour(rng)),
+                    ("Sub-evento-Lugar", rng.choice(PLACES)),
+                    ("Sub-evento-descripcion", description(rng)),
+                    ("Sub-evento-info-extra", escape(sentence(rng, 2, 6))),
+                ])
+                if activities:
+                    out.append("<Sub-evento-actividades>")
+                    for _ in range(activities):
+                        out.append("<actividad>")
+                        write_fields(out, [
+                            ("actividad-titulo", escape(sentence(rng, 2, 5))),
+                            ("actividad-hora", hour(rng)),
+                            ("actividad-lugar", rng.choice(PLACES)),
+                            ("actividad-descripcion", description(rng)),
+                            ("actividad-info-extra", escape(sentence(rng, 1, 4))),
+                        ])
+                        out.append("</actividad>")
+                    out.append("</Sub-evento-actividades>")
+                out.append("</Sub-evento>")
+            out.append("</Evento-Principal-Programa>")
+        out.append("</Evento-Principal>\n")
+    out.append("</Agenda>\n")
+    return "".join(out)
+
+def write_agenda(path, events, sub_events=3, activities=3, seed=1):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(generate_agenda(events, sub_events, activities, seed))
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera una agenda XML sintética.")
+    parser.add_argument("output", help="Ruta del XML que se genera.")
+    parser.add_argument("-e", "--events", type=int, default=300, help="Número de Evento-Principal.")
+    parser.add_argument("--sub-events", type=int, default=3, help="Sub-evento por cada Evento-Principal.")
+    parser.add_argument("--activities", type=int, default=3, help="actividad por cada Sub-evento.")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del generador.")
+    args = parser.parse_args(argv)
+    write_agenda(args.output, args.events, args.sub_events, args.activities, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+from zipfile import ZipFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx_writer
+from utils import (SanitizedXMLReader, sanitize_xml_content, load_config, open_sanitized_xml,
+                   parse_xml_file, compile_style_map, create_document, render_events)
+from docx_writer import COMPRESSION_LEVELS, DEFAULT_COMPRESSION, save_document
+from agenda_generator import write_agenda
+
+# Comprueba que las rutas rápidas dan exactamente el mismo resultado que las de
+# siempre. No hay batería de tests, así que conviene ejecutarlo tras tocar la
+# sanitización por bloques o el guardado por partes de document.xml. Termina con
+# código 1 si encuentra alguna diferencia.
+
+# Casos escritos a mano: cada uno parte un '&', un "amp;" o un "\r\n" en todas las
+# posiciones posibles al probarse con bloques de 1 a MAX_CHUNK_SIZE bytes.
+SANITIZE_CASES = [
+    "<a>Rock & Roll</a>",
+    "<a>Rock &amp; Roll</a>",
+    "<a>&amp;&&amp&am;&</a>",
+    "<a>amp; &amp</a>&",
+    "<a>línea\r\nsegunda\rtercera\n</a>\r",
+    "<a>&\r\n&amp;\r\r\n</a>\r\n",
+    "<a>ñandú & café — «&amp;»</a>",
+]
+FUZZ_ALPHABET = ["&", "a", "m", "p", ";", "amp;", "\r", "\n", "\r\n", "x", "ñ", "€", "<b>"]
+MAX_CHUNK_SIZE = 8
+
+def expected_sanitized(raw):
+    # Lo que hacía la ruta anterior: leer en modo texto (saltos de línea universales)
+    # y aplicar sanitize_xml_content al texto completo.
+    text = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    return sanitize_xml_content(text).encode('utf-8')
+
+def read_sanitized(path, chunk_size):
+    with SanitizedXMLReader(path, chunk_size) as reader:
+        return reader.read()
+
+def fuzz_cases(count, seed):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(1, 30)))
+            for _ in range(count)]
+
+def check_sanitizer(work_folder, fuzz_count, seed):
+    failures = []
+    path = os.path.join(work_folder, 'sanitize.xml')
+    for case in SANITIZE_CASES + fuzz_cases(fuzz_count, seed):
+        raw = case.encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(raw)
+        expected = expected_sanitized(raw)
+        for chunk_size in range(1, MAX_CHUNK_SIZE + 1):
+            result = read_sanitized(path, chunk_size)
+            if result != expected:
+                failures.append(f"sanitización con bloques de {chunk_size} bytes de {case!r}: "
+                                f"{result!r} en vez de {expected!r}")
+    return failures
+
+# Tamaño de bloque pequeño para que document.xml se escriba en muchos trozos.
+SMALL_STREAM_CHUNK_SIZE = 4096
+
+def build_document(xml_file, config):
+    # La agenda sólo tiene párrafos; se añaden una tabla y otra sección para que el
+    # w:body tenga también otros hijos y un w:sectPr dentro de un párrafo.
+    with open_sanitized_xml(xml_file) as sanitized_xml:
+        tree = parse_xml_file(sanitized_xml)
+    doc = create_document(config)
+    render_events(tree.getroot().findall('Evento-Principal'), doc, compile_style_map(config))
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Rock & Roll"
+    doc.add_section()
+    doc.add_paragraph("Última página")
+    return doc
+
+def zip_parts(path):
+    with ZipFile(path) as docx:
+        return [(name, docx.read(name)) for name in docx.namelist()]
+
+def compare_parts(label, expected_path, result_path):
+    expected, result = zip_parts(expected_path), zip_parts(result_path)
+    if [name for name, _ in expected] != [name for name, _ in result]:
+        return [f"{label}: el DOCX no tiene las mismas partes en el mismo orden"]
+    return [f"{label}: {name} es distinto"
+            for (name, expected_blob), (_, blob) in zip(expected, result)
+            if expected_blob != blob]
+
+def check_streaming_save(work_folder, events, seed):
+    failures = []
+    xml_file = write_agenda(os.path.join(work_folder, 'agenda.xml'), events, seed=seed)
+    doc = build_document(xml_file, load_config())
+
+    reference_path = os.path.join(work_folder, 'doc_save.docx')
+    doc.save(reference_path)
+    for compression in sorted(COMPRESSION_LEVELS):
+        normal_path = os.path.join(work_folder, f'{compression}.docx')
+        save_document(doc, normal_path, compression)
+        if compression == DEFAULT_COMPRESSION:
+            failures += compare_parts("save_document frente a doc.save", reference_path, normal_path)
+        for chunk_size in (docx_writer.STREAM_CHUNK_SIZE, SMALL_STREAM_CHUNK_SIZE):
+            streaming_path = os.path.join(work_folder, f'{compression}-streaming.docx')
+            default_chunk_size = docx_writer.STREAM_CHUNK_SIZE
+            docx_writer.STREAM_CHUNK_SIZE = chunk_size
+            try:
+                save_document(doc, streaming_path, compression, streaming=True)
+            finally:
+                docx_writer.STREAM_CHUNK_SIZE = default_chunk_size
+            failures += compare_parts(f"guardado por partes ({compression}, bloques de {chunk_size} bytes)",
+                                      normal_path, streaming_path)
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Comprueba que las rutas rápidas dan el mismo resultado que las de siempre.")
+    parser.add_argument("--fuzz", type=int, default=500,
+                        help="Textos aleatorios que se sanitizan además de los casos fijos.")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="Semilla de los textos aleatorios y de la agenda sintética.")
+    parser.add_argument("--events", type=int, default=100,
+                        help="Evento-Principal de la agenda con la que se compara el guardado.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        failures = check_sanitizer(work_folder, args.fuzz, args.seed)
+        failures += check_streaming_save(work_folder, args.events, args.seed)
+    for failure in failures:
+        print("Diferencia: " + failure)
+    if failures:
+        return 1
+    print("Sin diferencias.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import (load_config, open_sanitized_xml, parse_xml_file, compile_style_map,
+                   create_document, render_events)
+from docx_writer import COMPRESSION_LEVELS, save_document
+
+# Compara, para cada XML, el tiempo de guardado y el tamaño del DOCX con cada nivel de
+# compresión. El documento se construye una sola vez; sólo se mide doc.save.
+
+def build_document(xml_file, config):
+    with open_sanitized_xml(xml_file) as sanitized_xml:
+        tree = parse_xml_file(sanitized_xml)
+    doc = create_document(config)
+    render_events(tree.getroot().findall('Evento-Principal'), doc, compile_style_map(config))
+    return doc
+
+def benchmark_save(doc, compression, repeat, output_folder):
+    output_path = os.path.join(output_folder, f"{compression}.docx")
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        save_document(doc, output_path, compression)
+        timings.append(time.perf_counter() - start)
+    return min(timings), os.path.getsize(output_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide el tiempo de guardado y el tamaño del DOCX con cada nivel de compresión.")
+    parser.add_argument("xml_files", nargs="+", help="Agendas XML de prueba.")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Repeticiones por nivel; se muestra el mejor tiempo.")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    with tempfile.TemporaryDirectory() as output_folder:
+        for xml_file in args.xml_files:
+            doc = build_document(xml_file, config)
+            print(f"{xml_file}:")
+            print(f"  {'nivel':<8} {'tiempo (ms)':>12} {'tamaño (KB)':>12}")
+            for compression in COMPRESSION_LEVELS:
+                seconds, size = benchmark_save(doc, compression, args.repeat, output_folder)
+                print(f"  {compression:<8} {seconds * 1000:>12.1f} {size / 1024:>12.1f}")
+
+if __name__ == "__main__":
+    main()
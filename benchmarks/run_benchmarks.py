@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+try:
+    import resource
+except ImportError:
+    # No existe en Windows; entonces no se guarda el máximo de memoria del proceso.
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from utils import (CONVERTER_VERSION, DEFAULT_PARAGRAPH_STYLE, load_config, open_sanitized_xml,
+                   validate_xml_file, parse_xml_file, compile_style_map, create_document,
+                   render_events, ensure_style_exists, clean_default_styles)
+from docx_writer import save_document
+from agenda_generator import write_agenda
+
+# Mide cada etapa de process_xml_to_docx por separado sobre agendas sintéticas y guarda
+# los resultados en JSON. Con --compare se comparan con un JSON anterior y se marcan
+# las etapas que han empeorado más que el umbral.
+
+STAGES = ("sanitize", "validate", "parse", "build", "prune_styles", "save")
+READ_CHUNK_SIZE = 1024 * 1024
+# Diferencias de tiempo menores que esto se consideran ruido al comparar.
+MIN_SECONDS_DELTA = 0.005
+
+def stage_sanitize(state):
+    with open_sanitized_xml(state['xml_file']) as sanitized_xml:
+        while sanitized_xml.read(READ_CHUNK_SIZE):
+            pass
+
+def stage_validate(state):
+    with open_sanitized_xml(state['xml_file']) as sanitized_xml:
+        if not validate_xml_file(sanitized_xml):
+            raise ValueError(f"XML no válido: {state['xml_file']}")
+
+def stage_parse(state):
+    with open_sanitized_xml(state['xml_file']) as sanitized_xml:
+        state['tree'] = parse_xml_file(sanitized_xml)
+
+def stage_build(state):
+    config = state['config']
+    doc = create_document(config)
+    render_events(state['tree'].getroot().findall('Evento-Principal'), doc, compile_style_map(config))
+    state['doc'] = doc
+
+def stage_prune_styles(state):
+    # La plantilla se poda una vez por configuración; aquí se mide esa poda sobre un
+    # documento nuevo de python-docx.
+    template = Document()
+    ensure_style_exists(template, DEFAULT_PARAGRAPH_STYLE, 'parrafo')
+    start = time.perf_counter()
+    clean_default_styles(template, state['config'])
+    return time.perf_counter() - start
+
+def stage_save(state):
+    save_document(state['doc'], state['output_path'])
+
+STAGE_FUNCTIONS = {
+    "sanitize": stage_sanitize,
+    "validate": stage_validate,
+    "parse": stage_parse,
+    "build": stage_build,
+    "prune_styles": stage_prune_styles,
+    "save": stage_save,
+}
+
+def run_stage(name, state):
+    start = time.perf_counter()
+    measured = STAGE_FUNCTIONS[name](state)
+    elapsed = time.perf_counter() - start
+    # Las etapas que preparan algo que no se debe medir devuelven su propio tiempo.
+    return measured if measured is not None else elapsed
+
+def run_case(xml_file, output_folder, config, repeat):
+    # Tiempos: el mejor de repeat pasadas. Memoria: una pasada aparte con tracemalloc,
+    # que ralentiza la ejecución y falsearía los tiempos. tracemalloc sólo ve la memoria
+    # de Python, no la del árbol de lxml; para eso está max_rss_kb.
+    timings = {name: [] for name in STAGES}
+    for _ in range(repeat):
+        state = {'xml_file': xml_file, 'config': config,
+                 'output_path': os.path.join(output_folder, 'benchmark.docx')}
+        for name in STAGES:
+            timings[name].append(run_stage(name, state))
+
+    peaks = {}
+    state = {'xml_file': xml_file, 'config': config,
+             'output_path': os.path.join(output_folder, 'benchmark.docx')}
+    for name in STAGES:
+        tracemalloc.start()
+        run_stage(name, state)
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stages = {name: {'seconds': round(min(timings[name]), 6), 'peak_bytes': peaks[name]}
+              for name in STAGES}
+    return {
+        'xml_bytes': os.path.getsize(xml_file),
+        'paragraphs': len(state['doc'].element.body) - 1,
+        'docx_bytes': os.path.getsize(state['output_path']),
+        'stages': stages,
+        'total_seconds': round(sum(stage['seconds'] for stage in stages.values()), 6),
+    }
+
+def case_name(events, sub_events, activities):
+    return f"e{events}-s{sub_events}-a{activities}"
+
+def run_benchmarks(sizes, sub_events, activities, repeat, seed):
+    config = load_config()
+    cases = []
+    with tempfile.TemporaryDirectory() as work_folder:
+        for events in sizes:
+            name = case_name(events, sub_events, activities)
+            xml_file = write_agenda(os.path.join(work_folder, name + '.xml'),
+                                    events, sub_events, activities, seed)
+            result = run_case(xml_file, work_folder, config, repeat)
+            result.update({'name': name, 'events': events, 'sub_events': sub_events,
+                           'activities': activities})
+            cases.append(result)
+            print(f"{name}: {result['total_seconds']:.3f} s "
+                  + " ".join(f"{stage}={result['stages'][stage]['seconds'] * 1000:.1f}ms"
+                             for stage in STAGES))
+    return {
+        'converter_version': CONVERTER_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'repeat': repeat,
+        'seed': seed,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        'cases': cases,
+    }
+
+def compare_results(previous, current, threshold):
+    # Devuelve las etapas cuyo tiempo o memoria ha crecido más que threshold (0.2 = 20 %).
+    regressions = []
+    previous_cases = {case['name']: case for case in previous.get('cases', [])}
+    for case in current['cases']:
+        old_case = previous_cases.get(case['name'])
+        if old_case is None:
+            continue
+        for stage in STAGES:
+            old, new = old_case['stages'].get(stage), case['stages'][stage]
+            if old is None:
+                continue
+            for metric in ('seconds', 'peak_bytes'):
+                if metric == 'seconds' and new[metric] - old[metric] < MIN_SECONDS_DELTA:
+                    continue
+                if old[metric] and new[metric] > old[metric] * (1 + threshold):
+                    regressions.append((case['name'], stage, metric, old[metric], new[metric]))
+    return regressions
+
+def parse_sizes(text):
+    return [int(size) for size in text.split(',') if size.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide cada etapa de la conversión sobre agendas sintéticas.")
+    parser.add_argument("--sizes", type=parse_sizes, default=[50, 300, 1000],
+                        help="Número de Evento-Principal de cada caso, separados por comas.")
+    parser.add_argument("--sub-events", type=int, default=3, help="Sub-evento por cada Evento-Principal.")
+    parser.add_argument("--activities", type=int, default=3, help="actividad por cada Sub-evento.")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Repeticiones por caso; se guarda el mejor tiempo.")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del generador.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json",
+                        help="JSON donde se guardan los resultados.")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="Resultados anteriores con los que comparar.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Empeoramiento relativo a partir del cual se avisa (0.2 = 20 %%).")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.sub_events, args.activities, args.repeat, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+        regressions = compare_results(previous, results, args.threshold)
+        for name, stage, metric, old, new in regressions:
+            print(f"Empeora {name} {stage} {metric}: {old} -> {new} ({new / old - 1:+.0%})")
+        if regressions:
+            return 1
+        print("Sin empeoramientos respecto a " + args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import argparse
+import os
+import sys
+from utils import load_config
+from batch import collect_xml_files, convert_file, process_xml_batch
+from watcher import watch_folder
+from docx_writer import COMPRESSION_LEVELS, DEFAULT_COMPRESSION
+from metrics import ConversionStats, PROFILE_ENV_VAR
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+# Códigos de salida
+EXIT_OK = 0
+EXIT_CONVERSION_ERROR = 1
+EXIT_USAGE_ERROR = 2
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="xml_to_docx",
+        description="Convierte agendas XML a documentos DOCX sin interfaz gráfica.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Archivos XML, carpetas o patrones glob a convertir.")
+    parser.add_argument("-o", "--output-folder", required=True,
+                        help="Carpeta donde se guardan los DOCX.")
+    parser.add_argument("-n", "--name",
+                        help="Nombre del DOCX de salida (sólo con un único XML de entrada).")
+    parser.add_argument("-c", "--config",
+                        help="Ruta a un styles_config.json alternativo.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Número de conversiones en paralelo (0 = un proceso por CPU).")
+    parser.add_argument("--event-jobs", type=int, default=1,
+                        help="Procesos que renderizan en paralelo los eventos de cada XML "
+                             "(0 = uno por CPU; sólo con --jobs 1).")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Procesa cada XML con iterparse, con memoria constante, y escribe "
+                             "document.xml por partes al guardar.")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help="Reutiliza los DOCX de conversiones anteriores con el mismo XML y la "
+                             f"misma configuración (carpeta por defecto: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Tamaño máximo de la caché en MB; se eliminan primero las entradas "
+                             "usadas hace más tiempo.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Vuelve a renderizar sólo los Evento-Principal que han cambiado desde "
+                             "la conversión anterior del mismo DOCX.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_LEVELS), default=DEFAULT_COMPRESSION,
+                        help="Compresión del DOCX: store (sin comprimir, el guardado más rápido), "
+                             "fast, default o max (el archivo más pequeño).")
+    parser.add_argument("--stats", action="store_true",
+                        help="Muestra el tiempo, la CPU y los recuentos de cada etapa de cada conversión.")
+    parser.add_argument("--stats-memory", action="store_true",
+                        help="Con --stats, mide también el pico de memoria de cada etapa (más lento).")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Perfila cada conversión con cProfile y tracemalloc y deja <salida>.prof "
+                             f"y <salida>.alloc.txt junto a cada DOCX (también con {PROFILE_ENV_VAR}=1).")
+    parser.add_argument("--watch", action="store_true",
+                        help="Vigila la carpeta de entrada y convierte los XML nuevos o modificados "
+                             "hasta que se interrumpe con Ctrl+C.")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="Segundos entre sondeos de la carpeta en modo --watch.")
+    return parser
+
+def expand_inputs(inputs):
+    xml_files = []
+    for source in inputs:
+        if os.path.isfile(source):
+            xml_files.append(source)
+        else:
+            xml_files.extend(collect_xml_files(source))
+    return list(dict.fromkeys(xml_files))
+
+def report_progress(done, total, xml_file, error):
+    if error:
+        print(f"[{done}/{total}] {xml_file}: error: {error}", file=sys.stderr)
+    else:
+        print(f"[{done}/{total}] {xml_file}: completado")
+
+def report_watch_progress(xml_file, error):
+    if error:
+        print(f"{xml_file}: error: {error}", file=sys.stderr)
+    else:
+        print(f"{xml_file}: completado")
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.cache_max_mb <= 0:
+        parser.error("--cache-max-mb debe ser positivo.")
+    if args.jobs < 0:
+        parser.error("--jobs debe ser 0 o un número positivo.")
+    if args.event_jobs < 0:
+        parser.error("--event-jobs debe ser 0 o un número positivo.")
+    event_jobs = args.event_jobs or os.cpu_count() or 1
+    if event_jobs > 1 and args.jobs != 1:
+        parser.error("--event-jobs sólo se puede combinar con --jobs 1.")
+    if event_jobs > 1 and args.streaming:
+        parser.error("--event-jobs no es compatible con --streaming.")
+    if event_jobs > 1 and args.incremental:
+        parser.error("--event-jobs no es compatible con --incremental.")
+    if args.stats_memory and not args.stats:
+        parser.error("--stats-memory necesita --stats.")
+    if args.config and not os.path.isfile(args.config):
+        parser.error(f"no existe el archivo de configuración: {args.config}")
+    if not os.path.isdir(args.output_folder):
+        parser.error(f"no existe la carpeta de salida: {args.output_folder}")
+
+    if args.watch:
+        if len(args.inputs) != 1 or not os.path.isdir(args.inputs[0]):
+            parser.error("--watch necesita una única carpeta de entrada.")
+        if args.interval <= 0:
+            parser.error("--interval debe ser positivo.")
+        if args.event_jobs != 1:
+            parser.error("--event-jobs no es compatible con --watch.")
+        if args.name:
+            parser.error("--name no es compatible con --watch.")
+        config = load_config(args.config) if args.config else None
+        cache = ConversionCache(args.cache, args.cache_max_mb * 1024 * 1024) if args.cache else None
+        print(f"Vigilando {args.inputs[0]} (Ctrl+C para terminar)...")
+        try:
+            watch_folder(args.inputs[0], args.output_folder, interval=args.interval,
+                         settle_time=args.interval, max_workers=args.jobs or None,
+                         config=config, progress_callback=report_watch_progress,
+                         incremental=args.incremental, compression=args.compression,
+                         streaming=args.streaming, cache=cache, log_stats=args.stats,
+                         trace_memory=args.stats_memory, profile=args.profile)
+        except KeyboardInterrupt:
+            pass
+        return EXIT_OK
+
+    xml_files = expand_inputs(args.inputs)
+    if not xml_files:
+        parser.error("no se han encontrado archivos XML para convertir.")
+    if args.name and len(xml_files) > 1:
+        parser.error("--name sólo se puede usar con un único archivo XML.")
+
+    config = load_config(args.config) if args.config else None
+    cache = ConversionCache(args.cache, args.cache_max_mb * 1024 * 1024) if args.cache else None
+
+    if args.name:
+        output_file_name = args.name if args.name.endswith(".docx") else args.name + ".docx"
+        stats = ConversionStats(trace_memory=args.stats_memory, log=True) if args.stats else None
+        try:
+            convert_file(xml_files[0], args.output_folder, output_file_name,
+                         streaming=args.streaming, config=config, event_jobs=event_jobs,
+                         cache=cache, incremental=args.incremental,
+                         compression=args.compression, stats=stats, profile=args.profile)
+        except Exception as e:
+            report_progress(1, 1, xml_files[0], str(e))
+            return EXIT_CONVERSION_ERROR
+        report_progress(1, 1, xml_files[0], None)
+        return EXIT_OK
+
+    results = process_xml_batch(xml_files, args.output_folder, max_workers=args.jobs or None,
+                                progress_callback=report_progress,
+                                streaming=args.streaming, config=config, event_jobs=event_jobs,
+                                cache=cache, incremental=args.incremental,
+                                compression=args.compression, log_stats=args.stats,
+                                trace_memory=args.stats_memory, profile=args.profile)
+    failed = [result for result in results if result[2]]
+    if failed:
+        print(f"{len(results) - len(failed)} correctos, {len(failed)} con errores.", file=sys.stderr)
+        return EXIT_CONVERSION_ERROR
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from utils import CONVERTER_VERSION, open_sanitized_xml
+from docx_writer import DEFAULT_COMPRESSION
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "xml_to_docx")
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ConversionCache:
+    # Caché en disco de DOCX ya generados. La clave combina el hash del XML sanitizado,
+    # la configuración de estilos, el nivel de compresión y la versión del conversor. Cada entrada es un
+    # <clave>.docx; su fecha de modificación se actualiza en cada acierto y, al superar
+    # max_bytes, se eliminan primero las usadas hace más tiempo (LRU).
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key_for(self, xml_file, config, compression=DEFAULT_COMPRESSION):
+        digest = hashlib.sha256()
+        digest.update(CONVERTER_VERSION.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(compression.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        with open_sanitized_xml(xml_file) as sanitized_xml:
+            for chunk in iter(lambda: sanitized_xml.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".docx")
+
+    def fetch(self, key, output_path):
+        entry = self.entry_path(key)
+        try:
+            shutil.copyfile(entry, output_path)
+            os.utime(entry)
+        except OSError:
+            # Una entrada que no existe o una caché que no se puede leer cuentan como
+            # fallo de caché: el DOCX se genera de nuevo.
+            return False
+        return True
+
+    def store(self, key, docx_path):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(docx_path, temp_path)
+            os.replace(temp_path, self.entry_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".docx"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,116 @@
+import re
+import zlib
+from lxml import etree
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from docx.opc.pkgwriter import PackageWriter
+
+# Niveles de compresión del DOCX: (método zip, nivel zlib). "default" es lo mismo que
+# usa doc.save de python-docx; "store" no comprime y es el más rápido al guardar.
+COMPRESSION_LEVELS = {
+    'default': (ZIP_DEFLATED, None),
+    'store': (ZIP_STORED, None),
+    'fast': (ZIP_DEFLATED, 1),
+    'max': (ZIP_DEFLATED, zlib.Z_BEST_COMPRESSION),
+}
+DEFAULT_COMPRESSION = 'default'
+# Tamaño aproximado de los bloques que se pasan al compresor al escribir document.xml
+# por partes.
+STREAM_CHUNK_SIZE = 1024 * 1024
+NAMESPACE_DECLARATION = re.compile(rb' xmlns(?::[\w.-]+)?="[^"]*"')
+NAMESPACE_DECLARATIONS = re.compile(rb'(?: xmlns(?::[\w.-]+)?="[^"]*")+')
+
+class ZipPartWriter:
+    # Sustituye al _ZipPkgWriter de python-docx, que siempre usa ZIP_DEFLATED con el
+    # nivel por defecto. Tiene la misma interfaz (write/close) para poder reutilizar
+    # los métodos de PackageWriter que escriben cada parte.
+    def __init__(self, pkg_file, compression=DEFAULT_COMPRESSION):
+        if compression not in COMPRESSION_LEVELS:
+            raise ValueError(f"Nivel de compresión desconocido: {compression}")
+        method, level = COMPRESSION_LEVELS[compression]
+        self._zipf = ZipFile(pkg_file, "w", compression=method, compresslevel=level)
+
+    def write(self, pack_uri, blob):
+        self._zipf.writestr(pack_uri.membername, blob)
+
+    def write_document_xml(self, pack_uri, document):
+        # Escribe document.xml directamente en la entrada del zip, hijo a hijo del
+        # w:body, sin generar antes el XML completo en memoria. El resultado es idéntico
+        # byte a byte al de etree.tostring(document, encoding="UTF-8", standalone=True).
+        shell = document.makeelement(document.tag, document.attrib, nsmap=document.nsmap)
+        head = etree.tostring(shell, encoding="UTF-8", standalone=True)[:-2] + b'>'
+        inherited = dict.fromkeys(NAMESPACE_DECLARATION.findall(head[head.index(b'?>'):]), b'')
+
+        with self._zipf.open(pack_uri.membername, 'w') as entry:
+            chunk = [head]
+            chunk_size = len(head)
+            for xml in iter_document_children(document, inherited):
+                chunk.append(xml)
+                chunk_size += len(xml)
+                if chunk_size >= STREAM_CHUNK_SIZE:
+                    entry.write(b''.join(chunk))
+                    chunk, chunk_size = [], 0
+            chunk.append(end_tag(document))
+            entry.write(b''.join(chunk))
+
+    def close(self):
+        self._zipf.close()
+
+def end_tag(element):
+    qname = element.tag.split('}')[-1]
+    if element.prefix:
+        qname = element.prefix + ':' + qname
+    return b'</' + qname.encode('utf-8') + b'>'
+
+def serialize_child(element, inherited):
+    # Al serializar un elemento suelto, lxml vuelve a declarar en él todos los espacios
+    # de nombres del documento; como ya están declarados en w:document, se quitan.
+    # inherited asocia cada bloque de declaraciones ya visto con lo que queda de él.
+    xml = etree.tostring(element, encoding="UTF-8")
+    declarations = NAMESPACE_DECLARATIONS.match(xml, xml.find(b' '))
+    if declarations:
+        block = declarations.group()
+        own = inherited.get(block)
+        if own is None:
+            own = inherited[block] = b''.join(
+                declaration for declaration in NAMESPACE_DECLARATION.findall(block)
+                if declaration not in inherited)
+        xml = xml[:declarations.start()] + own + xml[declarations.end():]
+    return xml
+
+def iter_document_children(document, inherited):
+    # Serializa por separado cada párrafo o tabla del w:body, que es donde está casi
+    # todo el documento; el resto de hijos de w:document se serializa entero.
+    for child in document:
+        if child is not document.body:
+            yield serialize_child(child, inherited)
+            continue
+        body = child.makeelement(child.tag, child.attrib, nsmap=child.nsmap)
+        yield serialize_child(body, inherited)[:-2] + b'>'
+        for element in child:
+            yield serialize_child(element, inherited)
+        yield end_tag(child)
+
+def save_document(doc, output_path, compression=DEFAULT_COMPRESSION, streaming=False):
+    # Equivale a doc.save(output_path) pero con el nivel de compresión elegido. Con
+    # streaming=True, document.xml se serializa por partes directamente en el zip en vez
+    # de generar primero el XML completo y después su copia comprimida.
+    package = doc.part.package
+    for part in package.parts:
+        part.before_marshal()
+    parts = list(package.parts)
+    writer = ZipPartWriter(output_path, compression)
+    try:
+        PackageWriter._write_content_types_stream(writer, parts)
+        PackageWriter._write_pkg_rels(writer, package.rels)
+        if not streaming:
+            PackageWriter._write_parts(writer, parts)
+            return
+        for part in parts:
+            if part is doc.part:
+                writer.write_document_xml(part.partname, part.element)
+            else:
+                writer.write(part.partname, part.blob)
+            if len(part.rels):
+                writer.write(part.partname.rels_uri, part.rels.xml)
+    finally:
+        writer.close()
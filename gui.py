@@ -1,10 +1,23 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, font
+from tkinter import filedialog, messagebox, font, ttk
 import threading
+import queue
 import json
 import os
+import time
 import webbrowser
-from utils import process_xml_to_docx, load_config, save_config
+from utils import load_config, save_config, ConversionCancelled
+from batch import collect_xml_files, convert_file, process_xml_batch
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+# Cada cuántos milisegundos la ventana recoge los mensajes de las conversiones.
+PROGRESS_POLL_MS = 100
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    if minutes:
+        return f"quedan ~{minutes} min {seconds:02d} s"
+    return f"quedan ~{seconds} s"
 
 def start_gui():
     def select_xml_file():
@@ -15,10 +28,75 @@ def start_gui():
         folder_path = filedialog.askdirectory()
         output_folder_var.set(folder_path)
 
-    def start_processing():
-        threading.Thread(target=process_file).start()
+    def select_batch_folder():
+        folder_path = filedialog.askdirectory()
+        batch_source_var.set(folder_path)
+
+    # Los hilos de conversión no tocan la interfaz: dejan sus mensajes en progress_queue
+    # y el bucle de Tk los recoge con root.after en drain_progress_queue.
+    def post(kind, *args):
+        progress_queue.put((kind,) + args)
+
+    def drain_progress_queue():
+        try:
+            while True:
+                handle_message(*progress_queue.get_nowait())
+        except queue.Empty:
+            pass
+        root.after(PROGRESS_POLL_MS, drain_progress_queue)
+
+    def handle_message(kind, *args):
+        if kind == 'status':
+            status_var.set(args[0])
+        elif kind == 'log':
+            log_message(args[0])
+        elif kind == 'error':
+            messagebox.showerror("Error", args[0])
+        elif kind == 'start':
+            progress_state['start'] = time.monotonic()
+            progress_state['label'] = args[0]
+            progress_bar.config(value=0, maximum=1)
+            progress_var.set("")
+        elif kind == 'progress':
+            update_progress(*args)
+        elif kind == 'finish':
+            progress_var.set("")
+
+    def update_progress(done, total):
+        label = progress_state['label']
+        if total is None:
+            # En modo streaming no se conoce el total de eventos.
+            progress_var.set(f"{label} {done}")
+            return
+        progress_bar.config(maximum=max(total, 1), value=done)
+        elapsed = time.monotonic() - progress_state['start']
+        text = f"{label} {done}/{total}"
+        if 0 < done < total:
+            text += " · " + format_eta(elapsed / done * (total - done))
+        progress_var.set(text)
+
+    def start_worker(target, *args):
+        # Cada conversión lleva su propio cancel_event; "Cancelar" los activa todos.
+        cancel_event = threading.Event()
+        active_cancel_events.add(cancel_event)
+
+        def run():
+            try:
+                target(*args, cancel_event)
+            finally:
+                active_cancel_events.discard(cancel_event)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def cancel_processing():
+        if not active_cancel_events:
+            return
+        for cancel_event in list(active_cancel_events):
+            cancel_event.set()
+        status_var.set("Cancelando...")
+        log_message("Cancelando: se detendrá al terminar el evento en curso.")
 
-    def process_file():
+    def start_processing():
         xml_file = xml_file_var.get()
         output_folder = output_folder_var.get()
         output_file_name = output_file_var.get()
@@ -29,16 +107,90 @@ def start_gui():
         if not output_file_name.endswith(".docx"):
             output_file_name += ".docx"
 
-        status_var.set("Procesando...")
+        start_worker(process_file, xml_file, output_folder, output_file_name)
+
+    def start_batch_processing():
+        batch_source = batch_source_var.get()
+        output_folder = output_folder_var.get()
+        if not batch_source or not output_folder:
+            messagebox.showerror("Error", "Por favor, selecciona una carpeta o patrón de archivos XML y una carpeta de salida.")
+            return
+
+        xml_files = collect_xml_files(batch_source)
+        if not xml_files:
+            messagebox.showerror("Error", "No se han encontrado archivos XML para procesar.")
+            return
+
+        # La caché es opcional, como --cache en la línea de comandos.
+        cache = None
+        if use_cache_var.get():
+            try:
+                cache_max_mb = cache_max_mb_var.get()
+            except tk.TclError:
+                cache_max_mb = 0
+            if cache_max_mb <= 0:
+                messagebox.showerror("Error", "El tamaño máximo de la caché debe ser un número positivo de MB.")
+                return
+            cache = ConversionCache(DEFAULT_CACHE_DIR, cache_max_mb * 1024 * 1024)
+
+        start_worker(process_batch, xml_files, output_folder, cache)
+
+    def process_file(xml_file, output_folder, output_file_name, cancel_event):
+        post('status', "Procesando...")
+        post('start', "Evento")
+
+        try:
+            convert_file(xml_file, output_folder, output_file_name,
+                         progress_callback=lambda done, total: post('progress', done, total),
+                         cancel_event=cancel_event)
+            post('status', "Completado")
+            post('log', "Proceso completado exitosamente.")
+        except ConversionCancelled:
+            post('status', "Cancelado")
+            post('log', f"Conversión de {os.path.basename(xml_file)} cancelada; no se ha escrito {output_file_name}.")
+        except Exception as e:
+            post('status', "Error")
+            post('log', f"Error durante el proceso: {str(e)}")
+            post('error', f"Error durante el proceso: {str(e)}")
+        finally:
+            post('finish')
+
+    def process_batch(xml_files, output_folder, cache, cancel_event):
+        def report_progress(done, total, xml_file, error):
+            name = os.path.basename(xml_file)
+            post('status', f"Procesando lote... {done}/{total}")
+            post('progress', done, total)
+            if error:
+                post('log', f"[{done}/{total}] {name}: error: {error}")
+            else:
+                post('log', f"[{done}/{total}] {name}: completado")
+
+        post('status', "Procesando lote...")
+        post('start', "Archivo")
+        post('log', f"Procesando {len(xml_files)} archivos XML...")
 
         try:
-            process_xml_to_docx(xml_file, output_folder, output_file_name)
-            status_var.set("Completado")
-            log_message("Proceso completado exitosamente.")
+            results = process_xml_batch(xml_files, output_folder, progress_callback=report_progress,
+                                        cache=cache, cancel_event=cancel_event)
+        except ConversionCancelled:
+            post('status', "Cancelado")
+            post('log', "Lote cancelado; los archivos ya convertidos se conservan.")
+            return
         except Exception as e:
-            status_var.set("Error")
-            log_message(f"Error durante el proceso: {str(e)}")
-            messagebox.showerror("Error", f"Error durante el proceso: {str(e)}")
+            post('status', "Error")
+            post('log', f"Error durante el proceso: {str(e)}")
+            post('error', f"Error durante el proceso: {str(e)}")
+            return
+        finally:
+            post('finish')
+
+        failed = [result for result in results if result[2]]
+        if failed:
+            post('status', f"Completado con {len(failed)} errores")
+            post('log', f"Lote completado: {len(results) - len(failed)} correctos, {len(failed)} con errores.")
+        else:
+            post('status', "Completado")
+            post('log', f"Lote completado: {len(results)} archivos convertidos.")
 
     def update_config():
         config = {}
@@ -65,7 +217,14 @@ def start_gui():
     xml_file_var = tk.StringVar()
     output_folder_var = tk.StringVar()
     output_file_var = tk.StringVar()
+    batch_source_var = tk.StringVar()
     status_var = tk.StringVar()
+    progress_var = tk.StringVar()
+    use_cache_var = tk.BooleanVar(value=False)
+    cache_max_mb_var = tk.IntVar(value=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024))
+    progress_queue = queue.Queue()
+    progress_state = {'start': None, 'label': ""}
+    active_cancel_events = set()
 
     config = load_config()
 
@@ -130,10 +289,27 @@ def start_gui():
 
     tk.Button(right_frame, text="Iniciar Proceso", command=start_processing).grid(row=5, column=1, pady=10)
 
-    tk.Label(right_frame, textvariable=status_var).grid(row=6, column=1, padx=10, pady=10)
+    tk.Label(right_frame, text="Carpeta o patrón de XML (lote):").grid(row=6, column=0, padx=10, pady=10)
+    tk.Entry(right_frame, textvariable=batch_source_var, width=50).grid(row=6, column=1, padx=10, pady=10)
+    tk.Button(right_frame, text="Browse", command=select_batch_folder).grid(row=6, column=2, padx=10, pady=10)
+
+    tk.Button(right_frame, text="Procesar lote", command=start_batch_processing).grid(row=7, column=1, pady=10)
+
+    tk.Checkbutton(right_frame, text="Usar caché en el lote", variable=use_cache_var).grid(row=8, column=0, padx=10, pady=5)
+    cache_frame = tk.Frame(right_frame)
+    cache_frame.grid(row=8, column=1, padx=10, pady=5, sticky='w')
+    tk.Label(cache_frame, text="Tamaño máximo de la caché (MB):").grid(row=0, column=0)
+    tk.Spinbox(cache_frame, from_=1, to=100000, increment=64, textvariable=cache_max_mb_var, width=8).grid(row=0, column=1, padx=5)
+
+    tk.Label(right_frame, textvariable=status_var).grid(row=9, column=1, padx=10, pady=10)
+    tk.Button(right_frame, text="Cancelar", command=cancel_processing).grid(row=9, column=2, padx=10, pady=10)
+
+    progress_bar = ttk.Progressbar(right_frame, orient='horizontal', mode='determinate', length=400)
+    progress_bar.grid(row=10, column=0, columnspan=3, padx=10, pady=(0, 5), sticky='ew')
+    tk.Label(right_frame, textvariable=progress_var).grid(row=11, column=0, columnspan=3, padx=10)
 
     log_frame = tk.Frame(right_frame)
-    log_frame.grid(row=7, column=0, columnspan=3, padx=10, pady=10, sticky='ew')
+    log_frame.grid(row=12, column=0, columnspan=3, padx=10, pady=10, sticky='ew')
 
     tk.Label(log_frame, text="Logs del Proceso:").grid(row=0, column=0, padx=10, pady=10, sticky='w')
     log_text = tk.Text(log_frame, height=10, width=60, state=tk.DISABLED)
@@ -143,7 +319,7 @@ def start_gui():
     log_text['yscrollcommand'] = log_scroll.set
 
     footer_frame = tk.Frame(right_frame)
-    footer_frame.grid(row=8, column=0, columnspan=3, padx=10, pady=10, sticky='ew')
+    footer_frame.grid(row=13, column=0, columnspan=3, padx=10, pady=10, sticky='ew')
     
     footer_label = tk.Label(footer_frame, text="Programado por Francesc Xavier Escandell ", cursor="hand2", fg="#ffad67")
     footer_label.grid(row=0, column=0, sticky='e')
@@ -153,6 +329,7 @@ def start_gui():
     footer_link.grid(row=0, column=1, sticky='w')
     footer_link.bind("<Button-1>", open_link)
 
+    root.after(PROGRESS_POLL_MS, drain_progress_queue)
     root.mainloop()
 
 if __name__ == "__main__":
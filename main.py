@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from gui import start_gui
 
 def main():
@@ -11,6 +12,8 @@ def main():
         start_gui()
 
 if __name__ == "__main__":
+    # Necesario para que los procesos del modo lote arranquen en la app empaquetada.
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception as e:
@@ -0,0 +1,178 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Variable de entorno que activa el perfilado de todas las conversiones, también las
+# que se hacen en los procesos del lote o del modo --watch.
+PROFILE_ENV_VAR = "XML_TO_DOCX_PROFILE"
+TOP_ALLOCATIONS = 30
+ALLOCATION_FRAMES = 5
+
+# Métricas por etapa de una conversión. process_xml_to_docx recibe un ConversionStats y
+# lo rellena; si no se le pasa ninguno usa NULL_STATS, que no mide nada, así que con las
+# métricas desactivadas el coste es el de unas pocas llamadas vacías por conversión.
+
+class ConversionStats:
+    def __init__(self, trace_memory=False, log=False):
+        # trace_memory activa tracemalloc durante cada etapa para medir su pico de
+        # memoria; ralentiza bastante la conversión, por eso no va activado por defecto.
+        # Con log=True, process_xml_to_docx imprime el resumen al terminar.
+        self.trace_memory = trace_memory
+        self.log = log
+        self.stages = {}
+        self.counts = {}
+
+    def stage(self, name):
+        return StageTimer(self, name)
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def add_stage(self, name, wall_seconds, cpu_seconds, peak_bytes):
+        # Si una etapa se mide varias veces se suman los tiempos y se guarda el mayor pico.
+        stage = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                              'peak_bytes': None})
+        stage['wall_seconds'] += wall_seconds
+        stage['cpu_seconds'] += cpu_seconds
+        if peak_bytes is not None:
+            stage['peak_bytes'] = max(stage['peak_bytes'] or 0, peak_bytes)
+
+    @property
+    def wall_seconds(self):
+        return sum(stage['wall_seconds'] for stage in self.stages.values())
+
+    def as_dict(self):
+        return {'stages': self.stages, 'counts': self.counts}
+
+    def format(self, label=None):
+        lines = [f"{label}: {self.wall_seconds:.3f} s" if label else f"{self.wall_seconds:.3f} s"]
+        for name, stage in self.stages.items():
+            line = (f"  {name:<12} {stage['wall_seconds'] * 1000:>10.1f} ms"
+                    f"  CPU {stage['cpu_seconds'] * 1000:>10.1f} ms")
+            if stage['peak_bytes'] is not None:
+                line += f"  pico {stage['peak_bytes'] / 1024:>10.1f} KB"
+            lines.append(line)
+        if self.counts:
+            lines.append("  " + ", ".join(f"{name}={value}" for name, value in self.counts.items()))
+        return "\n".join(lines)
+
+class StageTimer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started_tracing = False
+        self.base_memory = None
+        if self.stats.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            reset_traced_peak()
+            self.base_memory = tracemalloc.get_traced_memory()[0]
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = time.process_time() - self.cpu_start
+        peak_bytes = None
+        if self.base_memory is not None:
+            peak_bytes = tracemalloc.get_traced_memory()[1] - self.base_memory
+            if self.started_tracing:
+                tracemalloc.stop()
+        self.stats.add_stage(self.name, wall_seconds, cpu_seconds, peak_bytes)
+        return False
+
+class NullStats:
+    log = False
+
+    def stage(self, name):
+        return NULL_STAGE
+
+    def count(self, name, value):
+        pass
+
+NULL_STAGE = nullcontext()
+NULL_STATS = NullStats()
+
+# Perfiladores en marcha. tracemalloc tiene un único pico para todo el proceso y cada
+# StageTimer lo reinicia; antes de hacerlo, reset_traced_peak guarda en cada perfilador
+# el pico que llevaba, para que su resumen cubra toda la conversión y no sólo la última
+# etapa.
+ACTIVE_PROFILERS = set()
+
+def reset_traced_peak():
+    for profiler in list(ACTIVE_PROFILERS):
+        profiler.record_peak()
+    tracemalloc.reset_peak()
+
+def profiling_requested():
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no')
+
+def profile_paths(output_path):
+    base = os.path.splitext(output_path)[0]
+    return base + '.prof', base + '.alloc.txt'
+
+class ConversionProfiler:
+    # Perfila una conversión con cProfile y tracemalloc. Al salir deja junto al DOCX
+    # <salida>.prof (para pstats o snakeviz) y <salida>.alloc.txt con las líneas que más
+    # memoria tenían reservada cuando el documento estaba completo.
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.profile = cProfile.Profile()
+        self.snapshot = None
+        self.peak = 0
+
+    def __enter__(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(ALLOCATION_FRAMES)
+        ACTIVE_PROFILERS.add(self)
+        self.profile.enable()
+        return self
+
+    def record_peak(self):
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+
+    def take_snapshot(self):
+        # process_xml_to_docx lo llama justo antes de guardar, que es cuando el XML y el
+        # documento están en memoria a la vez.
+        self.snapshot = tracemalloc.take_snapshot()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        ACTIVE_PROFILERS.discard(self)
+        snapshot = self.snapshot or tracemalloc.take_snapshot()
+        self.record_peak()
+        current, peak = tracemalloc.get_traced_memory()[0], self.peak
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        profile_path, allocations_path = profile_paths(self.output_path)
+        self.profile.dump_stats(profile_path)
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        with open(allocations_path, 'w', encoding='utf-8') as file:
+            file.write(f"Pico de memoria: {peak / 1024:.1f} KB; al terminar: {current / 1024:.1f} KB\n")
+            file.write(f"Las {TOP_ALLOCATIONS} líneas con más memoria reservada:\n\n")
+            for stat in snapshot.statistics('traceback')[:TOP_ALLOCATIONS]:
+                file.write(f"{stat.size / 1024:.1f} KB en {stat.count} bloques\n")
+                for line in stat.traceback.format():
+                    file.write(line + "\n")
+                file.write("\n")
+        return False
+
+class NullProfiler:
+    def __enter__(self):
+        return self
+
+    def take_snapshot(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_PROFILER = NullProfiler()
@@ -1,6 +1,6 @@
 from setuptools import setup
 
-APP = ['main.py', 'gui.py', 'utils.py']
+APP = ['main.py', 'gui.py', 'utils.py', 'batch.py', 'docx_writer.py', 'metrics.py', 'conversion_cache.py']
 OPTIONS = {
     'argv_emulation': True,
     'packages': ['docx', 'lxml', 'json', 'os', 're', 'tkinter', 'threading', 'webbrowser'],
@@ -2,10 +2,47 @@ import xml.etree.ElementTree as ET
 from docx import Document
 from docx.shared import Pt
 from docx.enum.style import WD_STYLE_TYPE
+from docx.styles import BabelFish
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+from docx_writer import save_document, DEFAULT_COMPRESSION
+from metrics import NULL_STATS, NULL_PROFILER, ConversionProfiler, profiling_requested
 import json
 import os
 import sys
 import re
+import io
+import math
+import copy
+import hashlib
+import weakref
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # fcntl no existe en Windows; allí el bloqueo de la salida se toma con msvcrt.
+    fcntl = None
+    import msvcrt
+
+# Versión del conversor; forma parte de la clave de la caché de conversiones, así
+# que debe cambiar cuando cambie el DOCX que se genera.
+CONVERTER_VERSION = "0.1.0"
+DEFAULT_PARAGRAPH_STYLE = "Agenda-General-Parrafo"
+W_SECTPR = qn('w:sectPr')
+W_PSTYLE = qn('w:pStyle')
+W_RSTYLE = qn('w:rStyle')
+W_R = qn('w:r')
+W_VAL = qn('w:val')
+W_STYLE = qn('w:style')
+W_TYPE = qn('w:type')
+W_NAME = qn('w:name')
+# Valores de w:type que poda clean_default_styles; sin w:type el estilo es de párrafo.
+PRUNABLE_STYLE_TYPES = {None, 'paragraph', 'character'}
+W_STYLE_ID = qn('w:styleId')
+# Referencias de un estilo a otros por su styleId.
+STYLE_REFERENCE_TAGS = (qn('w:basedOn'), qn('w:next'), qn('w:link'))
 
 def get_config_file_path():
     if hasattr(sys, '_MEIPASS'):
@@ -13,15 +50,29 @@ def get_config_file_path():
     else:
         return os.path.join(os.path.dirname(__file__), 'styles_config.json')
 
-def load_config():
-    config_file = get_config_file_path()
+# La configuración se lee una vez y se guarda durante toda la vida del proceso; sólo
+# se vuelve a leer si cambia la fecha de modificación o el tamaño del archivo. El
+# diccionario devuelto es compartido y no debe modificarse.
+_config_cache = {'key': None, 'config': {}}
+
+def _config_cache_key(config_file):
+    stat = os.stat(config_file)
+    return (config_file, stat.st_mtime_ns, stat.st_size)
+
+def load_config(config_file=None):
+    if config_file is None:
+        config_file = get_config_file_path()
     if os.path.exists(config_file):
-        try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-                return config
-        except json.JSONDecodeError:
-            return {}
+        key = _config_cache_key(config_file)
+        if _config_cache['key'] != key:
+            try:
+                with open(config_file, 'r') as f:
+                    config = json.load(f)
+            except json.JSONDecodeError:
+                config = {}
+            _config_cache['key'] = key
+            _config_cache['config'] = config
+        return _config_cache['config']
     else:
         return {}
 
@@ -30,37 +81,154 @@ def save_config(config):
     try:
         with open(config_file, 'w') as f:
             json.dump(config, f, indent=4)
+        _config_cache['key'] = _config_cache_key(config_file)
+        _config_cache['config'] = config
     except Exception as e:
         print(f"Error al guardar la configuración: {e}")
 
+# Registro de estilos por documento (nombre -> estilo) y caché de styleId por
+# (nombre, tipo), indexados por la parte principal del documento para que
+# desaparezcan junto con él.
+_style_registries = weakref.WeakKeyDictionary()
+_style_id_caches = weakref.WeakKeyDictionary()
+
+def get_style_registry(doc):
+    registry = _style_registries.get(doc.part)
+    if registry is None:
+        registry = {style.name: style for style in doc.styles}
+        _style_registries[doc.part] = registry
+    return registry
+
+def get_style_id(doc, style_name, wd_style_type):
+    cache = _style_id_caches.get(doc.part)
+    if cache is None:
+        cache = _style_id_caches[doc.part] = {}
+    key = (style_name, wd_style_type)
+    if key not in cache:
+        cache[key] = doc.part.get_style_id(style_name, wd_style_type)
+    return cache[key]
+
+def invalidate_style_ids(doc):
+    _style_id_caches.pop(doc.part, None)
+
 def ensure_style_exists(doc, style_name, style_type):
-    styles = doc.styles
-    if style_name not in [style.name for style in styles]:
+    registry = get_style_registry(doc)
+    if style_name not in registry:
+        styles = doc.styles
         if style_type == 'parrafo':
             style = styles.add_style(style_name, WD_STYLE_TYPE.PARAGRAPH)
         elif style_type == 'caracter':
             style = styles.add_style(style_name, WD_STYLE_TYPE.CHARACTER)
         font = style.font
         font.size = Pt(12)
+        registry[style_name] = style
+        invalidate_style_ids(doc)
     return style_name
 
+def get_paragraph_style_id(doc, style_name):
+    # python-docx devuelve None para el estilo de párrafo por defecto (Normal); esos
+    # párrafos llevan el estilo general, igual que los que no tienen estilo propio.
+    return (get_style_id(doc, style_name, WD_STYLE_TYPE.PARAGRAPH)
+            or get_style_id(doc, DEFAULT_PARAGRAPH_STYLE, WD_STYLE_TYPE.PARAGRAPH))
+
+def insert_body_element(doc, element):
+    # Coloca el elemento al final del cuerpo, justo antes del w:sectPr final, sin la
+    # búsqueda de insert_element_before.
+    body = doc.element.body
+    try:
+        last = body[-1]
+    except IndexError:
+        last = None
+    if last is not None and last.tag == W_SECTPR:
+        last.addprevious(element)
+    else:
+        body.append(element)
+    return element
+
+def add_paragraph_element(doc):
+    # Crea el w:p directamente sobre el cuerpo, sin los objetos Paragraph de
+    # python-docx. Nace ya con el estilo general, que apply_styles sustituye si el
+    # campo lo indica.
+    paragraph = OxmlElement('w:p')
+    paragraph.style = get_style_id(doc, DEFAULT_PARAGRAPH_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    return insert_body_element(doc, paragraph)
+
+def add_run_element(paragraph, text):
+    # Igual que Paragraph.add_run: el texto pasa por el setter de CT_R, que convierte
+    # tabuladores y saltos de línea en w:tab y w:br.
+    run = paragraph.add_r()
+    if text:
+        run.text = text
+    return run
+
 def apply_styles(paragraph, text, style_name, style_type, doc):
     style_name = ensure_style_exists(doc, style_name, style_type)
     if style_type == 'parrafo':
-        paragraph.style = style_name
-        paragraph.add_run(text)
+        paragraph.style = get_paragraph_style_id(doc, style_name)
+        add_run_element(paragraph, text)
     elif style_type == 'caracter':
-        run = paragraph.add_run(text)
-        run.style = style_name
-
-def clean_default_styles(doc):
-    styles = doc.styles
-    keep_styles = {s['style'] for s in load_config().values()}
-    keep_styles.add("Agenda-General-Parrafo")
-
-    for style in list(styles):
-        if style.type in (WD_STYLE_TYPE.PARAGRAPH, WD_STYLE_TYPE.CHARACTER) and style.name not in keep_styles:
-            styles.element.remove(style.element)
+        run = add_run_element(paragraph, text)
+        run.style = get_style_id(doc, style_name, WD_STYLE_TYPE.CHARACTER)
+
+def get_keep_styles(config):
+    keep_styles = {s['style'] for s in config.values()}
+    keep_styles.add(DEFAULT_PARAGRAPH_STYLE)
+    return keep_styles
+
+def prune_styles(styles_element, keep_styles):
+    # Trabaja directamente sobre los w:style de w:styles, sin crear objetos de estilo de
+    # python-docx. Elimina los estilos de párrafo y de carácter cuyo nombre visible no
+    # está en keep_styles, salvo los que un estilo conservado necesita a través de
+    # basedOn/next/link (directa o indirectamente), y devuelve los nombres eliminados.
+    # Los estilos latentes y los de otros tipos no se tocan.
+    styles_by_id = {}
+    candidates = []
+    pending = []
+    for style in styles_element.iterchildren(W_STYLE):
+        styles_by_id[style.get(W_STYLE_ID)] = style
+        if style.get(W_TYPE) not in PRUNABLE_STYLE_TYPES:
+            pending.append(style)
+            continue
+        name = style.find(W_NAME)
+        name_val = name.get(W_VAL) if name is not None else None
+        style_name = BabelFish.internal2ui(name_val) if name_val is not None else None
+        if style_name in keep_styles:
+            pending.append(style)
+        else:
+            candidates.append((style, style_name))
+
+    # Cierre de las referencias desde los estilos que se conservan, por styleId.
+    referenced = set()
+    while pending:
+        style = pending.pop()
+        for reference in style.iterchildren(*STYLE_REFERENCE_TAGS):
+            style_id = reference.get(W_VAL)
+            if style_id in referenced or style_id not in styles_by_id:
+                continue
+            referenced.add(style_id)
+            pending.append(styles_by_id[style_id])
+
+    removed = [(style, style_name) for style, style_name in candidates
+               if style.get(W_STYLE_ID) not in referenced]
+    for style, _ in removed:
+        styles_element.remove(style)
+    return [style_name for _, style_name in removed]
+
+def clean_default_styles(doc, config=None):
+    if config is None:
+        config = load_config()
+    removed = prune_styles(doc.styles.element, get_keep_styles(config))
+
+    registry = _style_registries.get(doc.part)
+    if registry is not None:
+        for style_name in removed:
+            registry.pop(style_name, None)
+    invalidate_style_ids(doc)
+
+SANITIZE_CHUNK_SIZE = 1024 * 1024
+UNESCAPED_AMPERSAND = re.compile(rb'&(?!amp;)')
+# Bytes que necesita ver la búsqueda anticipada de UNESCAPED_AMPERSAND tras un '&'.
+AMPERSAND_LOOKAHEAD = len(b'amp;')
 
 def sanitize_xml_content(content):
     content = re.sub(r'&(?!amp;)', 'i', content)
@@ -78,187 +246,554 @@ def create_sanitized_copy(xml_file):
         file.write(sanitized_content)
     return sanitized_file
 
+def parse_xml_file(xml_file):
+    # Valida y analiza el XML en una sola pasada: devuelve el árbol o deja pasar
+    # el ET.ParseError, que incluye la línea y la columna en e.position.
+    return ET.parse(xml_file)
+
+class SanitizedXMLReader(io.RawIOBase):
+    # Archivo de solo lectura que sanitiza el XML por bloques de bytes de tamaño fijo,
+    # con el mismo resultado que sanitize_xml_content sobre el texto completo (incluida
+    # la conversión de saltos de línea del modo texto). Un '\r' final o un '&' en los
+    # últimos bytes de un bloque se guardan para el siguiente, porque su resultado
+    # depende de lo que venga después.
+    def __init__(self, xml_file, chunk_size=SANITIZE_CHUNK_SIZE):
+        super().__init__()
+        self._file = open(xml_file, 'rb')
+        self._chunk_size = chunk_size
+        self._carry = b''
+        self._chunk = b''
+        self._offset = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._chunk) and not self._eof:
+            self._chunk = self._next_chunk()
+            self._offset = 0
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def _next_chunk(self):
+        data = self._file.read(self._chunk_size)
+        self._eof = not data
+        data = self._carry + data
+        self._carry = b''
+
+        held_cr = b''
+        if not self._eof and data.endswith(b'\r'):
+            data, held_cr = data[:-1], b'\r'
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        if not self._eof:
+            cut = data.find(b'&', max(0, len(data) - AMPERSAND_LOOKAHEAD))
+            if cut != -1:
+                data, self._carry = data[:cut], data[cut:]
+        self._carry += held_cr
+
+        return UNESCAPED_AMPERSAND.sub(b'i', data)
+
+def open_sanitized_xml(xml_file):
+    # Devuelve un archivo de lectura con el XML ya sanitizado, listo para el parser,
+    # sin escribir ningún archivo temporal en disco y con memoria acotada al bloque.
+    return SanitizedXMLReader(xml_file)
+
 def validate_xml_file(xml_file):
     try:
-        tree = ET.parse(xml_file)
-        tree.getroot()
+        parse_xml_file(xml_file)
         return True
     except ET.ParseError:
         return False
 
+def format_parse_error(error):
+    line, column = error.position
+    return f"El archivo XML no está bien formateado después de la sanitización (línea {line}, columna {column})."
+
 def process_combined_elements(paragraph, text1, text2, style1, style2, doc):
     if text1:
         style1 = ensure_style_exists(doc, style1, 'caracter')
-        run1 = paragraph.add_run(text1)
-        run1.style = style1
+        run1 = add_run_element(paragraph, text1)
+        run1.style = get_style_id(doc, style1, WD_STYLE_TYPE.CHARACTER)
 
     if text1 and text2:
-        paragraph.add_run(" · ")
+        add_run_element(paragraph, " · ")
 
     if text2:
         style2 = ensure_style_exists(doc, style2, 'caracter')
-        run2 = paragraph.add_run(text2)
-        run2.style = style2
+        run2 = add_run_element(paragraph, text2)
+        run2.style = get_style_id(doc, style2, WD_STYLE_TYPE.CHARACTER)
 
 def process_fields(parent_element, fields, doc, config):
     for field in fields:
         element = parent_element.find(field)
         if element is not None and element.text and element.text.strip():
-            paragraph = doc.add_paragraph()
+            paragraph = add_paragraph_element(doc)
             style_name = config.get(field, {}).get('style', "Agenda-General-Parrafo")
             style_type = config.get(field, {}).get('type', 'parrafo')
             apply_styles(paragraph, element.text.strip(), style_name, style_type, doc)
 
-def process_activity(activity, doc, config):
-    activity_title = activity.find('actividad-titulo')
-    activity_time = activity.find('actividad-hora')
-    activity_place = activity.find('actividad-lugar')
-    activity_description = activity.find('actividad-descripcion')
-    activity_extra_info = activity.find('actividad-info-extra')
-
-    if activity_title is not None and activity_title.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, activity_title.text.strip(), 
-                     config.get('actividad-titulo', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('actividad-titulo', {}).get('type', 'parrafo'), doc)
-
-    if activity_time is not None or activity_place is not None:
-        paragraph = doc.add_paragraph()
-        text1 = activity_time.text.strip() if activity_time is not None and activity_time.text else ""
-        text2 = activity_place.text.strip() if activity_place is not None and activity_place.text else ""
-        style1 = config.get('actividad-hora', {}).get('style', "Agenda-General-Parrafo")
-        style2 = config.get('actividad-lugar', {}).get('style', "Agenda-General-Parrafo")
-        process_combined_elements(paragraph, text1, text2, style1, style2, doc)
-
-    if activity_description is not None and activity_description.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, activity_description.text.strip(), 
-                     config.get('actividad-descripcion', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('actividad-descripcion', {}).get('type', 'parrafo'), doc)
-    
-    if activity_extra_info is not None and activity_extra_info.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, activity_extra_info.text.strip(), 
-                     config.get('actividad-info-extra', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('actividad-info-extra', {}).get('type', 'parrafo'), doc)
-
-def process_sub_event(sub_event, doc, config):
-    sub_event_title = sub_event.find('Sub-evento-Titulo')
-    sub_event_day = sub_event.find('Sub-evento-Dia')
-    sub_event_time = sub_event.find('Sub-evento-Hora')
-    sub_event_place = sub_event.find('Sub-evento-Lugar')
-    sub_event_description = sub_event.find('Sub-evento-descripcion')
-    sub_event_extra_info = sub_event.find('Sub-evento-info-extra')
-    sub_event_activities = sub_event.find('Sub-evento-actividades')
-    
-    if sub_event_title is not None and sub_event_title.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, sub_event_title.text.strip(), 
-                     config.get('Sub-evento-Titulo', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Sub-evento-Titulo', {}).get('type', 'parrafo'), doc)
-
-    if sub_event_day is not None and sub_event_day.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, sub_event_day.text.strip(), 
-                     config.get('Sub-evento-Dia', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Sub-evento-Dia', {}).get('type', 'parrafo'), doc)
-
-    if sub_event_time is not None or sub_event_place is not None:
-        paragraph = doc.add_paragraph()
-        text1 = sub_event_time.text.strip() if sub_event_time is not None and sub_event_time.text else ""
-        text2 = sub_event_place.text.strip() if sub_event_place is not None and sub_event_place.text else ""
-        style1 = config.get('Sub-evento-Hora', {}).get('style', "Agenda-General-Parrafo")
-        style2 = config.get('Sub-evento-Lugar', {}).get('style', "Agenda-General-Parrafo")
-        process_combined_elements(paragraph, text1, text2, style1, style2, doc)
-
-    if sub_event_description is not None and sub_event_description.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, sub_event_description.text.strip(), 
-                     config.get('Sub-evento-descripcion', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Sub-evento-descripcion', {}).get('type', 'parrafo'), doc)
-
-    if sub_event_extra_info is not None and sub_event_extra_info.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, sub_event_extra_info.text.strip(), 
-                     config.get('Sub-evento-info-extra', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Sub-evento-info-extra', {}).get('type', 'parrafo'), doc)
-
+# Campos de cada elemento en el orden en que se escriben. Las parejas (hora, lugar)
+# comparten un mismo párrafo con estilos de carácter.
+EVENT_FIELDS = (
+    'Evento-Principal-Titulo',
+    'Evento-Principal-Dia',
+    ('Evento-Principal-Hora', 'Evento-Principal-Lugar'),
+    'Evento-Principal-Descripcion',
+    'Evento-Principal-info-extra',
+)
+SUB_EVENT_FIELDS = (
+    'Sub-evento-Titulo',
+    'Sub-evento-Dia',
+    ('Sub-evento-Hora', 'Sub-evento-Lugar'),
+    'Sub-evento-descripcion',
+    'Sub-evento-info-extra',
+)
+ACTIVITY_FIELDS = (
+    'actividad-titulo',
+    ('actividad-hora', 'actividad-lugar'),
+    'actividad-descripcion',
+    'actividad-info-extra',
+)
+
+def compile_style_map(config):
+    # Resuelve una sola vez el (estilo, tipo) de cada campo conocido. Los estilos se
+    # siguen creando en el documento la primera vez que se usan.
+    style_map = {}
+    for layout in (EVENT_FIELDS, SUB_EVENT_FIELDS, ACTIVITY_FIELDS):
+        for field in layout:
+            for tag in (field if isinstance(field, tuple) else (field,)):
+                field_config = config.get(tag, {})
+                style_map[tag] = (field_config.get('style', DEFAULT_PARAGRAPH_STYLE),
+                                  field_config.get('type', 'parrafo'))
+    return style_map
+
+def collect_fields(element):
+    # Una sola pasada por los hijos; como find(), se queda con la primera aparición.
+    fields = {}
+    for child in element:
+        fields.setdefault(child.tag, child)
+    return fields
+
+def render_fields(fields, layout, doc, style_map):
+    for field in layout:
+        if isinstance(field, tuple):
+            time_tag, place_tag = field
+            time_element = fields.get(time_tag)
+            place_element = fields.get(place_tag)
+            if time_element is not None or place_element is not None:
+                paragraph = add_paragraph_element(doc)
+                text1 = time_element.text.strip() if time_element is not None and time_element.text else ""
+                text2 = place_element.text.strip() if place_element is not None and place_element.text else ""
+                process_combined_elements(paragraph, text1, text2,
+                                          style_map[time_tag][0], style_map[place_tag][0], doc)
+        else:
+            element = fields.get(field)
+            if element is not None and element.text:
+                paragraph = add_paragraph_element(doc)
+                style_name, style_type = style_map[field]
+                apply_styles(paragraph, element.text.strip(), style_name, style_type, doc)
+
+def process_activity(activity, doc, style_map):
+    render_fields(collect_fields(activity), ACTIVITY_FIELDS, doc, style_map)
+
+def process_sub_event(sub_event, doc, style_map):
+    fields = collect_fields(sub_event)
+    render_fields(fields, SUB_EVENT_FIELDS, doc, style_map)
+
+    sub_event_activities = fields.get('Sub-evento-actividades')
     if sub_event_activities is not None:
-        for activity in sub_event_activities.findall('actividad'):
-            process_activity(activity, doc, config)
-
-def process_event(event, doc, config):
-    event_title = event.find('Evento-Principal-Titulo')
-    event_day = event.find('Evento-Principal-Dia')
-    event_time = event.find('Evento-Principal-Hora')
-    event_place = event.find('Evento-Principal-Lugar')
-    event_description = event.find('Evento-Principal-Descripcion')
-    event_extra_info = event.find('Evento-Principal-info-extra')
-
-    if event_title is not None and event_title.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, event_title.text.strip(), 
-                     config.get('Evento-Principal-Titulo', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Evento-Principal-Titulo', {}).get('type', 'parrafo'), doc)
-
-    if event_day is not None and event_day.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, event_day.text.strip(), 
-                     config.get('Evento-Principal-Dia', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Evento-Principal-Dia', {}).get('type', 'parrafo'), doc)
-
-    if event_time is not None or event_place is not None:
-        paragraph = doc.add_paragraph()
-        text1 = event_time.text.strip() if event_time is not None and event_time.text else ""
-        text2 = event_place.text.strip() if event_place is not None and event_place.text else ""
-        style1 = config.get('Evento-Principal-Hora', {}).get('style', "Agenda-General-Parrafo")
-        style2 = config.get('Evento-Principal-Lugar', {}).get('style', "Agenda-General-Parrafo")
-        process_combined_elements(paragraph, text1, text2, style1, style2, doc)
-
-    if event_description is not None and event_description.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, event_description.text.strip(), 
-                     config.get('Evento-Principal-Descripcion', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Evento-Principal-Descripcion', {}).get('type', 'parrafo'), doc)
-
-    if event_extra_info is not None and event_extra_info.text:
-        paragraph = doc.add_paragraph()
-        apply_styles(paragraph, event_extra_info.text.strip(), 
-                     config.get('Evento-Principal-info-extra', {}).get('style', "Agenda-General-Parrafo"),
-                     config.get('Evento-Principal-info-extra', {}).get('type', 'parrafo'), doc)
-
-def process_xml_to_docx(xml_file, output_folder, output_file_name):
-    sanitized_file = create_sanitized_copy(xml_file)
-    if not validate_xml_file(sanitized_file):
-        print("Error: El archivo XML no está bien formateado después de la sanitización.")
+        for activity in sub_event_activities:
+            if activity.tag == 'actividad':
+                process_activity(activity, doc, style_map)
+
+def process_event(event, doc, style_map):
+    fields = collect_fields(event)
+    render_fields(fields, EVENT_FIELDS, doc, style_map)
+    return fields
+
+def process_event_tree(event, doc, style_map):
+    fields = process_event(event, doc, style_map)
+
+    programa = fields.get('Evento-Principal-Programa')
+    if programa is not None:
+        for sub_event in programa:
+            if sub_event.tag == 'Sub-evento':
+                process_sub_event(sub_event, doc, style_map)
+
+def iter_events(xml_file):
+    # Recorre el XML con iterparse y entrega cada Evento-Principal hijo de la raíz
+    # en cuanto se cierra; después se vacía la raíz para que la memoria no crezca
+    # con el tamaño del archivo.
+    root = None
+    depth = 0
+    for action, element in ET.iterparse(xml_file, events=('start', 'end')):
+        if action == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if element.tag == 'Evento-Principal':
+                yield element
+            root.clear()
+
+# Plantilla ya preparada para la configuración actual: estilos por defecto podados y
+# estilo general creado. Se construye una vez por conjunto de estilos a conservar y
+# cada conversión parte de una copia profunda, así que ya no hace falta abrir
+# default.docx ni podar estilos en cada conversión.
+_template_cache = {'key': None, 'document': None}
+
+def create_document(config):
+    key = frozenset(get_keep_styles(config))
+    if _template_cache['key'] != key:
+        template = Document()
+        ensure_style_exists(template, DEFAULT_PARAGRAPH_STYLE, 'parrafo')
+        clean_default_styles(template, config)
+        _template_cache['key'] = key
+        _template_cache['document'] = template
+    return copy.deepcopy(_template_cache['document'])
+
+def collect_fragment_styles(doc, fragment):
+    # (nombre, tipo) de los estilos a los que hace referencia el fragmento, en orden de
+    # primera aparición, que es el mismo orden en que ensure_style_exists los crearía.
+    styles_by_id = {}
+    for style_name, style in get_style_registry(doc).items():
+        if style.type == WD_STYLE_TYPE.PARAGRAPH:
+            styles_by_id[(W_PSTYLE, style.style_id)] = (style_name, 'parrafo')
+        elif style.type == WD_STYLE_TYPE.CHARACTER:
+            styles_by_id[(W_RSTYLE, style.style_id)] = (style_name, 'caracter')
+
+    styles = {}
+    for element in fragment.iter(W_PSTYLE, W_RSTYLE):
+        style = styles_by_id.get((element.tag, element.get(W_VAL)))
+        if style is not None:
+            styles.setdefault(style)
+    return list(styles)
+
+def render_events_fragment(events_xml, config):
+    # Trabajo de cada proceso en el modo paralelo: convierte un bloque de
+    # Evento-Principal en un documento propio y devuelve su w:body serializado (sin
+    # w:sectPr) junto con los estilos que necesita.
+    events = ET.fromstring(events_xml)
+    style_map = compile_style_map(config)
+    doc = create_document(config)
+
+    for event in events:
+        process_event_tree(event, doc, style_map)
+
+    body = doc.element.body
+    body.remove(body.sectPr)
+    return etree.tostring(body), collect_fragment_styles(doc, body)
+
+def splice_fragment(doc, fragment_xml, styles):
+    for style_name, style_type in styles:
+        ensure_style_exists(doc, style_name, style_type)
+    for element in list(parse_xml(fragment_xml)):
+        insert_body_element(doc, element)
+
+def render_events_parallel(events, doc, config, jobs, progress_callback=None, cancel_event=None):
+    # Reparte los eventos en bloques consecutivos, los renderiza en paralelo y los
+    # vuelve a unir en el documento en su orden original. Los estilos de cada bloque
+    # se crean antes de insertarlo, así que styles.xml queda igual que en secuencial.
+    if not events:
         return
+    chunk_size = max(1, math.ceil(len(events) / (jobs * 4)))
+    chunks = [b'<Agenda>' + b''.join(ET.tostring(event) for event in events[i:i + chunk_size]) + b'</Agenda>'
+              for i in range(0, len(events), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+        for done, (fragment_xml, styles) in enumerate(executor.map(render_events_fragment, chunks,
+                                                                   [config] * len(chunks)), 1):
+            if cancel_event is not None and cancel_event.is_set():
+                executor.shutdown(cancel_futures=True)
+                raise ConversionCancelled()
+            splice_fragment(doc, fragment_xml, styles)
+            if progress_callback:
+                progress_callback(min(done * chunk_size, len(events)), len(events))
+
+def event_fingerprint(event):
+    # Hash del subárbol del evento, sin el texto que le sigue (tail), que depende sólo
+    # del formato del archivo.
+    tail, event.tail = event.tail, None
+    try:
+        return hashlib.sha256(ET.tostring(event)).hexdigest()
+    finally:
+        event.tail = tail
 
-    config = load_config()
-    tree = ET.parse(sanitized_file)
-    root = tree.getroot()
-
-    doc = Document()
-
-    if "Agenda-General-Parrafo" not in [style.name for style in doc.styles]:
-        general_style = doc.styles.add_style("Agenda-General-Parrafo", WD_STYLE_TYPE.PARAGRAPH)
-        general_style.font.size = Pt(12)
-
-    for event in root.findall('Evento-Principal'):
-        process_event(event, doc, config)
-        
-        programa = event.find('Evento-Principal-Programa')
-        if programa is not None:
-            for sub_event in programa.findall('Sub-evento'):
-                process_sub_event(sub_event, doc, config)
+def fragment_store_path(output_folder, output_file_name):
+    return os.path.join(output_folder, '.' + output_file_name + '.fragments.json')
 
-    clean_default_styles(doc)
+def load_fragment_store(store_path, config):
+    # Fragmentos de la ejecución anterior: huella del evento -> (w:body serializado,
+    # estilos). Sólo valen si coinciden la versión del conversor y la configuración.
+    try:
+        with open(store_path, 'r') as f:
+            store = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if store.get('version') != CONVERTER_VERSION or store.get('config') != config:
+        return {}
+    return {fingerprint: (fragment['xml'].encode('utf-8'), [tuple(style) for style in fragment['styles']])
+            for fingerprint, fragment in store.get('events', {}).items()}
+
+def save_fragment_store(store_path, config, fragments):
+    store = {
+        'version': CONVERTER_VERSION,
+        'config': config,
+        'events': {fingerprint: {'xml': fragment_xml.decode('utf-8'), 'styles': styles}
+                   for fingerprint, (fragment_xml, styles) in fragments.items()},
+    }
+    temp_path = store_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(store, f)
+    os.replace(temp_path, store_path)
+
+def render_events_incremental(events, doc, style_map, previous_fragments):
+    # Reutiliza el fragmento guardado de cada evento cuya huella no ha cambiado y sólo
+    # renderiza los nuevos o modificados. Devuelve los fragmentos de esta ejecución.
+    fragments = {}
+    body = doc.element.body
+    sect_pr = body.sectPr
+
+    for event in events:
+        fingerprint = event_fingerprint(event)
+        cached = fragments.get(fingerprint) or previous_fragments.get(fingerprint)
+        if cached is not None:
+            splice_fragment(doc, *cached)
+            fragments[fingerprint] = cached
+            continue
+
+        if sect_pr is not None:
+            anchor = sect_pr.getprevious()
+        else:
+            anchor = body[-1] if len(body) else None
+        process_event_tree(event, doc, style_map)
+
+        fragment = OxmlElement('w:body')
+        element = anchor.getnext() if anchor is not None else body[0]
+        while element is not None and element is not sect_pr:
+            fragment.append(copy.deepcopy(element))
+            element = element.getnext()
+        fragments[fingerprint] = (etree.tostring(fragment), collect_fragment_styles(doc, fragment))
+
+    return fragments
+
+# Los mensajes se generan en __str__ para que las excepciones lleguen intactas desde
+# los procesos del lote, que las envían serializadas con sus args.
+class ConversionCancelled(Exception):
+    def __str__(self):
+        return "Conversión cancelada."
+
+class ConversionInProgress(Exception):
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.output_path = output_path
+
+    def __str__(self):
+        return f"Ya hay una conversión en curso hacia {self.output_path}."
+
+def output_lock_path(output_path):
+    return output_path + '.lock'
+
+def lock_file(fd):
+    # Bloqueo exclusivo sin espera; lanza OSError si otro lo tiene. El sistema lo
+    # suelta al cerrar el descriptor o al morir el proceso, así que un cierre a mitad
+    # de una conversión no deja la salida bloqueada.
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
 
-    for paragraph in doc.paragraphs:
-        if paragraph.style is None or paragraph.style.name == 'Normal':
-            paragraph.style = "Agenda-General-Parrafo"
+def unlock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
 
+def acquire_output_lock(output_path):
+    lock_path = output_lock_path(output_path)
+    while True:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            lock_file(fd)
+        except OSError:
+            os.close(fd)
+            raise ConversionInProgress(output_path)
+        # Si la conversión anterior borró el archivo entre nuestro open y el bloqueo,
+        # lo que tenemos bloqueado ya no está en disco: se vuelve a intentar.
+        try:
+            if os.path.samestat(os.fstat(fd), os.stat(lock_path)):
+                return fd
+        except FileNotFoundError:
+            pass
+        unlock_file(fd)
+        os.close(fd)
+
+def release_output_lock(output_path, fd):
+    lock_path = output_lock_path(output_path)
+    if fcntl is not None:
+        # En POSIX se borra mientras aún está bloqueado, para no borrar el de otra
+        # conversión que lo haya creado de nuevo.
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        unlock_file(fd)
+        os.close(fd)
+        return
+    # En Windows un archivo abierto no se puede borrar: se borra después de cerrarlo,
+    # y si otra conversión ya lo ha abierto el borrado falla y se queda.
+    unlock_file(fd)
+    os.close(fd)
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+
+@contextmanager
+def claim_output(output_path):
+    # Sólo deja pasar una conversión a la vez por archivo de salida, también entre
+    # procesos (el lote y el modo --watch convierten en un ProcessPoolExecutor): una
+    # segunda conversión hacia el mismo DOCX falla en vez de escribir encima de la
+    # primera. El bloqueo se toma sobre <salida>.lock y dura toda la conversión.
+    fd = acquire_output_lock(output_path)
+    try:
+        yield
+    finally:
+        release_output_lock(output_path, fd)
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ConversionCancelled()
+
+def track_events(events, progress_callback=None, total=None, cancel_event=None,
+                 stats=NULL_STATS):
+    # Recorre los eventos comprobando antes de cada uno si se ha pedido cancelar, y
+    # llama a progress_callback(hechos, total) cuando se ha terminado cada uno, que es
+    # cuando se pide el siguiente. En modo streaming no se sabe el total y se pasa None;
+    # por eso los eventos se cuentan aquí y se anotan en stats al acabar.
+    done = 0
+    for event in events:
+        check_cancelled(cancel_event)
+        yield event
+        done += 1
+        if progress_callback:
+            progress_callback(done, total)
+    stats.count('events', done)
+
+def render_events(events, doc, style_map, previous_fragments=None):
+    if previous_fragments is not None:
+        return render_events_incremental(events, doc, style_map, previous_fragments)
+    for event in events:
+        process_event_tree(event, doc, style_map)
+
+def process_xml_to_docx(xml_file, output_folder, output_file_name, streaming=False, config=None,
+                        jobs=1, cache=None, incremental=False, compression=DEFAULT_COMPRESSION,
+                        stats=None, profile=None, progress_callback=None, cancel_event=None):
+    # Con stats (un metrics.ConversionStats) se anotan el tiempo, la CPU y, si se pide,
+    # el pico de memoria de cada etapa junto con algunos recuentos. Con profile=True, o
+    # si está definida XML_TO_DOCX_PROFILE, se perfila la conversión y se dejan los
+    # resultados junto al DOCX. progress_callback(hechos, total) se llama después de
+    # cada Evento-Principal; en modo streaming el total es None. Si se activa
+    # cancel_event (un threading.Event) la conversión se detiene entre dos eventos con
+    # ConversionCancelled, sin escribir el DOCX. Un XML mal formado lanza ValueError
+    # con la línea y la columna del error.
+    if config is None:
+        config = load_config()
+    if stats is None:
+        stats = NULL_STATS
     output_path = os.path.join(output_folder, output_file_name)
-    doc.save(output_path)
-
-    if os.path.exists(sanitized_file):
-        os.remove(sanitized_file)
+    if profile is None:
+        profile = profiling_requested()
+    profiler = ConversionProfiler(output_path) if profile else NULL_PROFILER
+
+    # El bloqueo va primero: una conversión rechazada no debe sobrescribir los
+    # archivos de perfilado de la que está en curso.
+    with claim_output(output_path), profiler:
+        if cache is not None:
+            with stats.stage('cache_lookup'):
+                cache_key = cache.key_for(xml_file, config, compression)
+                cache_hit = cache.fetch(cache_key, output_path)
+            if cache_hit:
+                stats.count('cache_hits', 1)
+                if stats.log:
+                    print(stats.format(output_file_name))
+                return output_path
+
+        if not streaming:
+            try:
+                with stats.stage('parse'), open_sanitized_xml(xml_file) as sanitized_xml:
+                    tree = parse_xml_file(sanitized_xml)
+            except ET.ParseError as e:
+                raise ValueError(format_parse_error(e)) from e
+
+        with stats.stage('template'):
+            style_map = compile_style_map(config)
+
+            doc = create_document(config)
+
+            # En modo incremental se parte de los fragmentos de la conversión anterior de
+            # este mismo archivo de salida.
+            previous_fragments = None
+            if incremental:
+                store_path = fragment_store_path(output_folder, output_file_name)
+                previous_fragments = load_fragment_store(store_path, config)
+
+        if streaming:
+            try:
+                with stats.stage('render'), open_sanitized_xml(xml_file) as sanitized_xml:
+                    events = iter_events(sanitized_xml)
+                    if progress_callback or cancel_event is not None or stats is not NULL_STATS:
+                        events = track_events(events, progress_callback, None, cancel_event,
+                                              stats)
+                    fragments = render_events(events, doc, style_map, previous_fragments)
+            except ET.ParseError as e:
+                raise ValueError(format_parse_error(e)) from e
+        else:
+            events = tree.getroot().findall('Evento-Principal')
+            stats.count('events', len(events))
+            with stats.stage('render'):
+                if jobs > 1 and not incremental:
+                    render_events_parallel(events, doc, config, jobs, progress_callback, cancel_event)
+                else:
+                    if progress_callback or cancel_event is not None:
+                        events = track_events(events, progress_callback, len(events), cancel_event)
+                    fragments = render_events(events, doc, style_map, previous_fragments)
+        stats.count('paragraphs', len(doc.element.body) - 1)
+        if stats is not NULL_STATS:
+            # Recorrer todo el cuerpo cuesta algo, así que sólo se hace con métricas.
+            stats.count('runs', sum(1 for _ in doc.element.body.iter(W_R)))
+
+        check_cancelled(cancel_event)
+        profiler.take_snapshot()
+
+        # Todos los estilos que se han añadido salen de la configuración, así que el
+        # documento ya está limpio: la plantilla se podó al crearla.
+        with stats.stage('save'):
+            save_document(doc, output_path, compression, streaming=streaming)
+            if incremental:
+                save_fragment_store(store_path, config, fragments)
+        if cache is not None:
+            with stats.stage('cache_store'):
+                try:
+                    cache.store(cache_key, output_path)
+                except OSError as e:
+                    # El DOCX ya está guardado: una caché llena o sin permisos de escritura
+                    # no debe hacer fallar la conversión.
+                    print(f"Aviso: no se pudo guardar {output_file_name} en la caché: {e}")
+        if stats.log:
+            print(stats.format(output_file_name))
+        return output_path
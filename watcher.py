@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from batch import convert_file, output_name_for
+from utils import load_config
+from docx_writer import DEFAULT_COMPRESSION
+from metrics import ConversionStats
+
+# Estado persistente del vigilante: hash de cada XML ya convertido y de la
+# configuración con la que se convirtió. Se guarda en la carpeta de salida.
+STATE_FILE_NAME = '.xml_to_docx_watch.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_watch_state(state_file):
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def save_watch_state(state_file, state):
+    temp_file = state_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(temp_file, state_file)
+
+def scan_xml_files(folder):
+    # Firma barata (mtime, tamaño) de cada .xml de la carpeta, para detectar cambios
+    # sin leer los archivos en cada sondeo.
+    signatures = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith('.xml'):
+                stat = entry.stat()
+                signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+def watch_folder(source_folder, output_folder, interval=2.0, settle_time=2.0, max_workers=None,
+                 config=None, progress_callback=None, stop_event=None, incremental=False,
+                 compression=DEFAULT_COMPRESSION, streaming=False, cache=None, log_stats=False,
+                 trace_memory=False, profile=None):
+    # Vigila source_folder por sondeo y convierte a output_folder cada XML nuevo o
+    # modificado. Un archivo sólo se convierte cuando su firma lleva settle_time
+    # segundos sin cambiar (sigue copiándose mientras tanto), y se omite si su hash
+    # coincide con el de la última conversión. Termina cuando se activa stop_event.
+    # El resto de opciones se pasan a cada conversión como en process_xml_batch.
+    if config is None:
+        config = load_config()
+
+    state_file = os.path.join(output_folder, STATE_FILE_NAME)
+    state = load_watch_state(state_file)
+    current_config_hash = config_hash(config)
+    if state.get('config') != current_config_hash:
+        state = {'config': current_config_hash, 'files': {}}
+    converted = state.setdefault('files', {})
+
+    observed = {}
+    handled = {}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        while not (stop_event and stop_event.is_set()):
+            now = time.monotonic()
+            signatures = scan_xml_files(source_folder)
+            in_progress = {xml_file for xml_file, _ in running.values()}
+
+            for xml_file, signature in signatures.items():
+                previous = observed.get(xml_file)
+                if previous is None or previous[0] != signature:
+                    observed[xml_file] = (signature, now)
+                    continue
+                if now - previous[1] < settle_time or handled.get(xml_file) == signature:
+                    continue
+                if xml_file in in_progress:
+                    continue
+
+                name = os.path.basename(xml_file)
+                content_hash = file_hash(xml_file)
+                output_path = os.path.join(output_folder, output_name_for(xml_file))
+                if converted.get(name) == content_hash and os.path.exists(output_path):
+                    handled[xml_file] = signature
+                    continue
+
+                stats = ConversionStats(trace_memory=trace_memory, log=True) if log_stats else None
+                future = executor.submit(convert_file, xml_file, output_folder, config=config,
+                                         streaming=streaming, cache=cache,
+                                         incremental=incremental, compression=compression,
+                                         stats=stats, profile=profile)
+                running[future] = (xml_file, (signature, content_hash))
+
+            for xml_file in set(observed) - set(signatures):
+                observed.pop(xml_file, None)
+                handled.pop(xml_file, None)
+
+            for future in [future for future in running if future.done()]:
+                xml_file, (signature, content_hash) = running.pop(future)
+                handled[xml_file] = signature
+                try:
+                    future.result()
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                else:
+                    converted[os.path.basename(xml_file)] = content_hash
+                    save_watch_state(state_file, state)
+                if progress_callback:
+                    progress_callback(xml_file, error)
+
+            if stop_event:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)